@@ -8,20 +8,30 @@ import toml
 logger = getLogger(__name__)
 CACHE_PATH = "cache.toml"
 
+# 読み込み済みのキャッシュ内容。保存時はファイルを読み直さずにこれを更新する
+_cache_state: dict | None = None
+
 
 def load_cache() -> dict:
-    """実行環境ファイルを読み込む関数"""
-    logger.debug("キャッシュファイルの読み込み")
-    if os.path.exists(CACHE_PATH):
-        with open(CACHE_PATH, "r", encoding="utf-8") as file:
-            return toml.load(file)
-    else:
-        return {}
+    """実行環境ファイルを読み込む関数
+
+    ファイルの読み込みは初回のみ行い、以降は読み込み済みの内容を返す
+    """
+    global _cache_state
+    if _cache_state is None:
+        logger.debug("キャッシュファイルの読み込み")
+        if os.path.exists(CACHE_PATH):
+            with open(CACHE_PATH, "r", encoding="utf-8") as file:
+                _cache_state = toml.load(file)
+        else:
+            _cache_state = {}
+    return _cache_state
 
 
 def save_cache(settings: dict) -> None:
     """設定ファイルに書き込む関数"""
     current_cache = load_cache()
+    current_cache.update(settings)
     with open(CACHE_PATH, "w", encoding="utf-8") as file:
-        toml.dump(current_cache | settings, file)
+        toml.dump(current_cache, file)
     logger.debug("キャッシュファイルの保存")
@@ -1,25 +1,47 @@
 """DB接続関連のモジュール"""
 
 import sqlite3
+import threading
 
-_first_connection = True
+# プロセス内で共有するDB接続
+_conn: sqlite3.Connection | None = None
+_conn_lock = threading.Lock()
 
 
 def get_db_connection() -> sqlite3.Connection:
     """DB接続を取得する
 
-    初回の呼び出し時にsrtbテーブルが存在しない場合は作成する
+    初回の呼び出し時に接続を開いてsrtbテーブルが存在しない場合は作成し、以降は同じ接続を返す。
+    呼び出し側で接続を閉じないこと。
 
     Returns:
         sqlite3.Connection: DB接続
     """
-    global _first_connection
-    conn = sqlite3.connect("charts.db")
-    if _first_connection:
-        create_srtb_table_if_not_exists(conn)
-        _first_connection = False  # フラグを更新して次回以降の呼び出しで処理が実行されないようにする
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            # トランザクションは呼び出し側で明示的に管理する
+            # UIスレッド以外からも使われるため、スレッドのチェックは行わない
+            conn = sqlite3.connect("charts.db", isolation_level=None, check_same_thread=False)
+            apply_pragmas(conn)
+            create_srtb_table_if_not_exists(conn)
+            _conn = conn
+    return _conn
 
-    return conn
+
+def apply_pragmas(conn: sqlite3.Connection) -> None:
+    """一括書き込み向けにPRAGMAを設定する
+
+    Args:
+        conn (sqlite3.Connection): DB接続
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")  # 64MiB
+    conn.execute("PRAGMA mmap_size=268435456")  # 256MiB
+    # INSERT OR REPLACEで置き換えられる行にもDELETEトリガーを発火させ、srtb_ftsとの同期を保つ
+    conn.execute("PRAGMA recursive_triggers=ON")
 
 
 def create_srtb_table_if_not_exists(conn: sqlite3.Connection) -> None:
@@ -41,12 +63,95 @@ def create_srtb_table_if_not_exists(conn: sqlite3.Connection) -> None:
             hard_difficulty INTEGER,
             expert_difficulty INTEGER,
             xd_difficulty INTEGER,
+            min_difficulty INTEGER,
+            max_difficulty INTEGER,
             albumart_asset_name TEXT NOT NULL,
             clip_asset_name TEXT NOT NULL,
             self_path TEXT NOT NULL,
             clip_duration INTEGER,
-            file_modified_at DATETIME,
+            file_modified_at REAL,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    add_difficulty_range_columns_if_not_exists(conn)
+    # 範囲検索用のインデックス
+    c.execute("CREATE INDEX IF NOT EXISTS idx_srtb_clip_duration ON srtb(clip_duration)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_srtb_min_difficulty ON srtb(min_difficulty)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_srtb_max_difficulty ON srtb(max_difficulty)")
+    # 最新更新日時(MAX(created_at))をインデックスの末尾から1行で取得するためのインデックス
+    c.execute("CREATE INDEX IF NOT EXISTS idx_srtb_created_at ON srtb(created_at)")
+    create_srtb_fts_if_not_exists(conn)
     conn.commit()
+
+
+def add_difficulty_range_columns_if_not_exists(conn: sqlite3.Connection) -> None:
+    """定義済み難易度の最小値・最大値のカラムが存在しない場合は追加する
+
+    以前のバージョンで作成されたsrtbテーブル向けに、カラムを追加して既存の行の値を埋める
+
+    Args:
+        conn (sqlite3.Connection): DB接続
+    """
+    c = conn.cursor()
+    columns = {row[1] for row in c.execute("PRAGMA table_info(srtb)")}
+    if "min_difficulty" in columns and "max_difficulty" in columns:
+        return
+    difficulties = """
+        SELECT easy_difficulty AS level
+        UNION ALL SELECT normal_difficulty
+        UNION ALL SELECT hard_difficulty
+        UNION ALL SELECT expert_difficulty
+        UNION ALL SELECT xd_difficulty
+    """
+    with conn:
+        c.execute("BEGIN")
+        c.execute("ALTER TABLE srtb ADD COLUMN min_difficulty INTEGER")
+        c.execute("ALTER TABLE srtb ADD COLUMN max_difficulty INTEGER")
+        c.execute(f"""
+            UPDATE srtb SET
+                min_difficulty = (SELECT MIN(level) FROM ({difficulties})),
+                max_difficulty = (SELECT MAX(level) FROM ({difficulties}))
+        """)  # noqa: S608
+
+
+def create_srtb_fts_if_not_exists(conn: sqlite3.Connection) -> None:
+    """部分一致検索用の全文検索テーブルが存在しない場合は作成する
+
+    srtbテーブルを外部コンテンツとするFTS5テーブルで、トリガーによりsrtbテーブルと同期する。
+    trigramトークナイザを使うため、LIKE '%...%' による検索にもインデックスが使われる。
+
+    Args:
+        conn (sqlite3.Connection): DB接続
+    """
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'srtb_fts'")
+    fts_exists = c.fetchone() is not None
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS srtb_fts USING fts5(
+            track_title, track_artist, charter,
+            content='srtb', content_rowid='rowid', tokenize='trigram'
+        )
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS srtb_fts_after_insert AFTER INSERT ON srtb BEGIN
+            INSERT INTO srtb_fts(rowid, track_title, track_artist, charter)
+            VALUES (new.rowid, new.track_title, new.track_artist, new.charter);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS srtb_fts_after_delete AFTER DELETE ON srtb BEGIN
+            INSERT INTO srtb_fts(srtb_fts, rowid, track_title, track_artist, charter)
+            VALUES ('delete', old.rowid, old.track_title, old.track_artist, old.charter);
+        END
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS srtb_fts_after_update AFTER UPDATE ON srtb BEGIN
+            INSERT INTO srtb_fts(srtb_fts, rowid, track_title, track_artist, charter)
+            VALUES ('delete', old.rowid, old.track_title, old.track_artist, old.charter);
+            INSERT INTO srtb_fts(rowid, track_title, track_artist, charter)
+            VALUES (new.rowid, new.track_title, new.track_artist, new.charter);
+        END
+    """)
+    if not fts_exists:
+        # 既存のsrtbテーブルの内容からインデックスを構築
+        c.execute("INSERT INTO srtb_fts(srtb_fts) VALUES ('rebuild')")
@@ -1,10 +1,12 @@
 """Spin Rhythm XDのカスタムチャートの情報をSQLiteに保存するモジュール"""
 
-from contextlib import closing
+import itertools
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
 from logging import getLogger
-from pathlib import Path
 from typing import Callable
 
 import srtb
@@ -12,6 +14,68 @@ import srtb
 from .connection import get_db_connection
 
 logger = getLogger(__name__)
+# まとめてINSERTする行数
+INSERT_BATCH_SIZE = 500
+# srtbファイルを並列に読み込むスレッド数
+LOAD_WORKERS = (os.cpu_count() or 1) * 2
+# 書き込みを待たずに先読みしておくsrtbファイル数
+LOAD_PREFETCH_SIZE = LOAD_WORKERS * 2
+# 1つのINSERT文にまとめる行数
+MULTI_ROW_INSERT_SIZE = 100
+# srtbテーブルに書き込むカラム
+SRTB_INSERT_COLUMNS = (
+    "file_reference",
+    "track_title",
+    "track_subtitle",
+    "track_artist",
+    "charter",
+    "easy_difficulty",
+    "normal_difficulty",
+    "hard_difficulty",
+    "expert_difficulty",
+    "xd_difficulty",
+    "min_difficulty",
+    "max_difficulty",
+    "albumart_asset_name",
+    "clip_asset_name",
+    "self_path",
+    "clip_duration",
+    "file_modified_at",
+)
+# INSERT文はここで一度だけ組み立て、毎回同じ文字列を渡してsqlite3のステートメントキャッシュを確実にヒットさせる
+# file_referenceが存在する場合は上書き
+_INSERT_QUERY_PREFIX = f"INSERT OR REPLACE INTO srtb ({', '.join(SRTB_INSERT_COLUMNS)}) VALUES "  # noqa: S608
+_INSERT_ROW_PLACEHOLDER = "(" + ", ".join(["?"] * len(SRTB_INSERT_COLUMNS)) + ")"
+_INSERT_ROW_QUERY = _INSERT_QUERY_PREFIX + _INSERT_ROW_PLACEHOLDER
+_INSERT_MULTI_ROWS_QUERY = _INSERT_QUERY_PREFIX + ", ".join([_INSERT_ROW_PLACEHOLDER] * MULTI_ROW_INSERT_SIZE)
+# 全文検索テーブル(trigram)でインデックスを引けるキーワードの最小文字数
+FTS_TRIGRAM_LENGTH = 3
+
+
+def _like_conditions(column: str, keywords: list[str], negate: bool = False) -> tuple[str, list[str]]:
+    """キーワードの部分一致条件を生成する
+
+    trigramでインデックスを引ける長さのキーワードは全文検索テーブルを使い、それより短いものは通常のLIKEで検索する
+
+    Args:
+        column (str): 検索対象のカラム名
+        keywords (list[str]): 検索キーワード
+        negate (bool, optional): キーワードを含まない行を対象とするか。 Defaults to False.
+
+    Returns:
+        tuple[str, list[str]]: 条件式と、バインドするパラメータ
+    """
+    like = "NOT LIKE" if negate else "LIKE"
+    fts_operator = "NOT IN" if negate else "IN"
+    keyword_conditions = []
+    for keyword in keywords:
+        if len(keyword) >= FTS_TRIGRAM_LENGTH:
+            # カラム名は内部で定義したもののみ
+            keyword_conditions.append(f"rowid {fts_operator} (SELECT rowid FROM srtb_fts WHERE {column} LIKE ?)")  # noqa: S608
+        else:
+            keyword_conditions.append(f"{column} {like} ?")
+    condition = "(" + (" AND " if negate else " OR ").join(keyword_conditions) + ")"
+    return condition, [f"%{keyword}%" for keyword in keywords]
 
 
 @dataclass
@@ -40,58 +104,59 @@ class SearchCondition:
     exclude_artist: list[str] | None = None
     exclude_charter: list[str] | None = None
 
-    def generate_where_query(self) -> str:
-        """検索条件からWHERE句を生成する
+    def generate_where_query(self) -> tuple[str, list]:
+        """検索条件からWHERE句とそのパラメータを生成する
 
         Returns:
-            str: WHERE句
+            tuple[str, list]: プレースホルダを含むWHERE句と、バインドするパラメータ
         """
         conditions = []
+        params: list = []
         if self.title and self.title[0] != "":
-            title_or_conditions = [f"track_title LIKE '%{title}%'" for title in self.title]
-            conditions.append("(" + " OR ".join(title_or_conditions) + ")")
+            title_condition, title_params = _like_conditions("track_title", self.title)
+            conditions.append(title_condition)
+            params.extend(title_params)
         if self.artist and self.artist[0] != "":
-            artist_or_conditions = [f"track_artist LIKE '%{artist}%'" for artist in self.artist]
-            conditions.append("(" + " OR ".join(artist_or_conditions) + ")")
+            artist_condition, artist_params = _like_conditions("track_artist", self.artist)
+            conditions.append(artist_condition)
+            params.extend(artist_params)
         if self.charter and self.charter[0] != "":
-            charter_or_conditions = [f"charter LIKE  '%{charter}%'" for charter in self.charter]
-            conditions.append("(" + " OR ".join(charter_or_conditions) + ")")
+            charter_condition, charter_params = _like_conditions("charter", self.charter)
+            conditions.append(charter_condition)
+            params.extend(charter_params)
+        # いずれかの難易度が範囲内であることは、定義済み難易度の最大値・最小値との比較だけで判定できる
         if self.min_diff_level:
-            min_diff_or_conditions = []
-            min_diff_or_conditions.append(f"easy_difficulty >= {self.min_diff_level}")
-            min_diff_or_conditions.append(f"normal_difficulty >= {self.min_diff_level}")
-            min_diff_or_conditions.append(f"hard_difficulty >= {self.min_diff_level}")
-            min_diff_or_conditions.append(f"expert_difficulty >= {self.min_diff_level}")
-            min_diff_or_conditions.append(f"xd_difficulty >= {self.min_diff_level}")
-            conditions.append("(" + " OR ".join(min_diff_or_conditions) + ")")
+            conditions.append("max_difficulty >= ?")
+            params.append(int(self.min_diff_level))
         if self.max_diff_level:
-            max_diff_or_conditions = []
-            max_diff_or_conditions.append(f"easy_difficulty <= {self.max_diff_level}")
-            max_diff_or_conditions.append(f"normal_difficulty <= {self.max_diff_level}")
-            max_diff_or_conditions.append(f"hard_difficulty <= {self.max_diff_level}")
-            max_diff_or_conditions.append(f"expert_difficulty <= {self.max_diff_level}")
-            max_diff_or_conditions.append(f"xd_difficulty <= {self.max_diff_level}")
-            conditions.append("(" + " OR ".join(max_diff_or_conditions) + ")")
+            conditions.append("min_difficulty <= ?")
+            params.append(int(self.max_diff_level))
         if self.min_duration:
-            conditions.append(f"clip_duration >= {self.min_duration}")
+            conditions.append("clip_duration >= ?")
+            params.append(int(self.min_duration))
         if self.max_duration:
-            conditions.append(f"clip_duration <= {self.max_duration}")
+            conditions.append("clip_duration <= ?")
+            params.append(int(self.max_duration))
         if self.exclude_artist:
-            exclude_artist_or_conditions = [f"track_artist NOT LIKE '%{artist}%'" for artist in self.exclude_artist]
-            conditions.append("(" + " AND ".join(exclude_artist_or_conditions) + ")")
+            exclude_artist_condition, exclude_artist_params = _like_conditions(
+                "track_artist", self.exclude_artist, negate=True
+            )
+            conditions.append(exclude_artist_condition)
+            params.extend(exclude_artist_params)
         if self.exclude_charter:
-            exclude_charter_or_conditions = [f"charter NOT LIKE '%{charter}%'" for charter in self.exclude_charter]
-            conditions.append("(" + " AND ".join(exclude_charter_or_conditions) + ")")
-        return " AND ".join(conditions)
+            exclude_charter_condition, exclude_charter_params = _like_conditions(
+                "charter", self.exclude_charter, negate=True
+            )
+            conditions.append(exclude_charter_condition)
+            params.extend(exclude_charter_params)
+        return " AND ".join(conditions), params
 
 
 def truncate_srtb_table() -> None:
     """srtbテーブルを初期化する"""
     conn = get_db_connection()
-    with closing(conn):
-        c = conn.cursor()
-        c.execute("DELETE FROM srtb")
-        conn.commit()
+    c = conn.cursor()
+    c.execute("DELETE FROM srtb")
 
 
 def get_latest_update_date() -> str:
@@ -101,10 +166,9 @@ def get_latest_update_date() -> str:
         str: 最新更新日時
     """
     conn = get_db_connection()
-    with closing(conn):
-        c = conn.cursor()
-        c.execute("SELECT datetime(MAX(created_at), '+9 hours') FROM srtb")
-        result = c.fetchone()
+    c = conn.cursor()
+    c.execute("SELECT datetime(MAX(created_at), '+9 hours') FROM srtb")
+    result = c.fetchone()
     return result[0] if result else ""
 
 
@@ -118,18 +182,116 @@ def search_file_reference(condition: SearchCondition) -> list[tuple[str, str, st
         list[tuple[str, str, str]]: ファイル参照名、アルバムアート名、クリップ名のリスト
     """
     conn = get_db_connection()
-    with closing(conn):
-        c = conn.cursor()
-        # すべての条件を満たす行を取得
-        query = "SELECT file_reference, albumart_asset_name, clip_asset_name FROM srtb"
-        where_query = condition.generate_where_query()
-        if where_query:
-            query += " WHERE " + where_query
-        c.execute(query)
-        result = c.fetchall()
+    c = conn.cursor()
+    # すべての条件を満たす行を取得
+    query = "SELECT file_reference, albumart_asset_name, clip_asset_name FROM srtb"
+    where_query, params = condition.generate_where_query()
+    if where_query:
+        query += " WHERE " + where_query
+    c.execute(query, params)
+    result = c.fetchall()
     return result
 
 
+def _get_difficulty_value(difficulty: srtb.ChartDifficulty) -> int | None:
+    """難易度が定義されていればそのレベルを、未定義ならNoneを返す"""
+    return difficulty.level if difficulty.is_defined else None
+
+
+def _load_chart_row(path: str, file_reference: str, file_modified_at: float) -> tuple[srtb.Srtb, tuple] | None:
+    """srtbファイルを読み込み、srtbテーブルに書き込む行を作成する
+
+    ワーカースレッドから呼び出されるため、DBには触れない
+
+    Args:
+        path (str): srtbファイルのパス
+        file_reference (str): ファイル参照名(拡張子を除いたファイル名)
+        file_modified_at (float): ファイルの更新日時(エポック秒)
+
+    Returns:
+        tuple[srtb.Srtb, tuple] | None: 読み込んだチャートと書き込む行。読み込みに失敗した場合はNone
+    """
+    try:
+        # srtbはJSONなので、テキストにデコードせずバイト列のままパーサに渡す
+        with open(path, "rb") as f:
+            chart = srtb.load(f)
+    except Exception:
+        logger.exception("%sの読み込みに失敗しました", file_reference)
+        return None
+    # クリップの長さも読み込み
+    chart.read_clip_metadata()
+    difficulty_levels = (
+        _get_difficulty_value(chart.easy_difficulty),
+        _get_difficulty_value(chart.normal_difficulty),
+        _get_difficulty_value(chart.hard_difficulty),
+        _get_difficulty_value(chart.expert_difficulty),
+        _get_difficulty_value(chart.xd_difficulty),
+    )
+    defined_levels = [level for level in difficulty_levels if level is not None]
+    row = (
+        chart.file_reference,
+        chart.track_title,
+        chart.track_subtitle,
+        chart.track_artist,
+        chart.charter,
+        *difficulty_levels,
+        min(defined_levels, default=None),
+        max(defined_levels, default=None),
+        chart.albumart_asset_name,
+        chart.clip_asset_name,
+        str(chart.self_path),
+        chart.clip_duration,
+        file_modified_at,
+    )
+    return chart, row
+
+
+def _list_updated_chart_files(
+    custom_chart_dir: str, modified_at_map: dict[str, float]
+) -> tuple[int, list[tuple[int, str, str, float]]]:
+    """ディレクトリ内のsrtbファイルのうち、新規または更新されたものを列挙する
+
+    Args:
+        custom_chart_dir (str): カスタムチャートのディレクトリ
+        modified_at_map (dict[str, float]): 読み込み済みファイルの参照名から更新日時への辞書
+
+    Returns:
+        tuple[int, list[tuple[int, str, str, float]]]: srtbファイルの総数と、
+            読み込み対象の(ファイル内の順番, パス, ファイル参照名, 更新日時)のリスト
+    """
+    # DirEntryはstat情報をキャッシュするため、Pathを経由せずに走査する
+    with os.scandir(custom_chart_dir) as it:
+        chart_file_list = [entry for entry in it if entry.name.lower().endswith(".srtb") and entry.is_file()]
+    targets = []
+    for idx, chart_file in enumerate(chart_file_list):
+        chart_file_stem = chart_file.name[:-5]
+        # 更新日時はエポック秒のまま比較・保存する
+        file_modified_at = chart_file.stat().st_mtime
+        if modified_at_map.get(chart_file_stem) == file_modified_at:
+            # すでに読み込み済みで更新されていないファイルはスキップ
+            continue
+        targets.append((idx, chart_file.path, chart_file_stem, file_modified_at))
+    return len(chart_file_list), targets
+
+
+def _insert_rows(c: sqlite3.Cursor, rows: list[tuple]) -> None:
+    """srtbテーブルに行を書き込む
+
+    複数行を1つのINSERT文にまとめて書き込み、端数は1行ずつのINSERT文で書き込む
+
+    Args:
+        c (sqlite3.Cursor): カーソル
+        rows (list[tuple]): 書き込む行
+    """
+    multi_row_end = len(rows) - len(rows) % MULTI_ROW_INSERT_SIZE
+    for start in range(0, multi_row_end, MULTI_ROW_INSERT_SIZE):
+        c.execute(
+            _INSERT_MULTI_ROWS_QUERY,
+            list(itertools.chain.from_iterable(rows[start : start + MULTI_ROW_INSERT_SIZE])),
+        )
+    c.executemany(_INSERT_ROW_QUERY, rows[multi_row_end:])
+
+
 # srtb.loadで指定されたディレクトリ内のsrtbファイルをすべて読み込み、SQLLiteに保存する
 def load_srtb_files_to_sqlite(
     custom_chart_dir: str, on_each_load: Callable[[srtb.Srtb, int, int], None] | None
@@ -141,59 +303,43 @@ def load_srtb_files_to_sqlite(
         on_each_load (Callable[[srtb.Srtb, int, int], None] | None): 各ファイル読み込み時に呼び出されるコールバック
     """
 
-    def get_difficulty_value(difficulty: srtb.ChartDifficulty) -> int:
-        return difficulty.level if difficulty.is_defined else None
+    def flush_rows() -> None:
+        # 溜めた行をまとめて書き込み、1トランザクションとしてコミット
+        if not rows:
+            return
+        # 共有の接続にトランザクションが残らないよう、例外時はロールバックする
+        with conn:
+            c.execute("BEGIN")
+            _insert_rows(c, rows)
+        rows.clear()
 
-    conn = get_db_connection()
-    c = conn.cursor()
-    chart_file_list = list(Path(custom_chart_dir).glob("*.srtb"))
-    for idx, chart_file in enumerate(chart_file_list):
-        file_modified_at = datetime.fromtimestamp(chart_file.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-        c.execute("SELECT file_modified_at FROM srtb WHERE file_reference = ?", (chart_file.stem,))
-        result = c.fetchone()
-        if result and result[0] == file_modified_at:
-            # すでに読み込み済みで更新されていないファイルはスキップ
-            continue
-        try:
-            with open(chart_file, "r", encoding="utf-8") as f:
-                chart = srtb.load(f)
-        except Exception:
-            logger.exception(f"{chart_file.stem}の読み込みに失敗しました")
-            continue
-        # クリップの長さも読み込み
-        chart.read_clip_metadata()
-        # chart内容を書き込み
+    def write_loaded_row(idx: int, future: Future[tuple[srtb.Srtb, tuple] | None]) -> None:
+        # 読み込み結果を書き込み対象に追加
+        loaded_row = future.result()
+        if loaded_row is None:
+            return
+        chart, row = loaded_row
         # file_referenceが存在する場合は上書き
-        c.execute(
-            """
-        INSERT OR REPLACE INTO srtb (
-            file_reference,
-            track_title, track_subtitle, track_artist, charter,
-            easy_difficulty, normal_difficulty, hard_difficulty,
-            expert_difficulty, xd_difficulty, albumart_asset_name,
-            clip_asset_name, self_path, clip_duration,
-            file_modified_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """,
-            (
-                chart.file_reference,
-                chart.track_title,
-                chart.track_subtitle,
-                chart.track_artist,
-                chart.charter,
-                get_difficulty_value(chart.easy_difficulty),
-                get_difficulty_value(chart.normal_difficulty),
-                get_difficulty_value(chart.hard_difficulty),
-                get_difficulty_value(chart.expert_difficulty),
-                get_difficulty_value(chart.xd_difficulty),
-                chart.albumart_asset_name,
-                chart.clip_asset_name,
-                str(chart.self_path),
-                chart.clip_duration,
-                file_modified_at,
-            ),
-        )
+        rows.append(row)
         if on_each_load:
-            on_each_load(chart, idx, len(chart_file_list))
-        conn.commit()
-    conn.close()
+            on_each_load(chart, idx, chart_file_count)
+        if len(rows) >= INSERT_BATCH_SIZE:
+            flush_rows()
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    rows: list[tuple] = []
+    # 読み込み済みファイルの更新日時をまとめて取得
+    modified_at_map = dict(c.execute("SELECT file_reference, file_modified_at FROM srtb").fetchall())
+    chart_file_count, targets = _list_updated_chart_files(custom_chart_dir, modified_at_map)
+    # 読み込みとパースはワーカースレッドで先読みし、DBへの書き込みはこのスレッドで順番に行う
+    # 先読みする件数を制限し、メモリ使用量を一定に保つ
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        pending: deque[tuple[int, Future[tuple[srtb.Srtb, tuple] | None]]] = deque()
+        for idx, path, chart_file_stem, file_modified_at in targets:
+            pending.append((idx, executor.submit(_load_chart_row, path, chart_file_stem, file_modified_at)))
+            if len(pending) >= LOAD_PREFETCH_SIZE:
+                write_loaded_row(*pending.popleft())
+        while pending:
+            write_loaded_row(*pending.popleft())
+    flush_rows()
@@ -1,14 +1,14 @@
 """ハードリンク作成処理を行うモジュール"""
 
-import glob
+import ctypes
+import errno
+import os
+from ctypes import wintypes
 from dataclasses import dataclass
 from logging import getLogger
 from pathlib import Path
 from typing import Callable
 
-import pywintypes
-import win32file
-
 import settings
 
 logger = getLogger(__name__)
@@ -17,16 +17,75 @@ AUDIO_CLIP_FOLDER_NAME = "AudioClips"
 ALBUM_ART_EXT = ["png"]
 AUDIO_CLIP_EXT = ["ogg", "mp3"]
 
+# pywin32を経由せず、CreateHardLinkWを直接呼び出す
+_kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)  # type: ignore[attr-defined]
+_CreateHardLinkW = _kernel32.CreateHardLinkW
+_CreateHardLinkW.argtypes = [wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.LPVOID]
+_CreateHardLinkW.restype = wintypes.BOOL
+
+
+def _create_hardlink(link_path: str, source_path: str) -> None:
+    """ハードリンクを作成する
+
+    失敗した場合はWindowsのエラーコードに対応するOSErrorのサブクラスを送出する。
+    例えばエラーコード2はFileNotFoundError、183はFileExistsError、17はerrnoがEXDEVのOSErrorとなる。
+    Args:
+        link_path (str): 作成するハードリンクのパス
+        source_path (str): リンク元ファイルのパス
+    """
+    if not _CreateHardLinkW(link_path, source_path, None):
+        raise ctypes.WinError(ctypes.get_last_error())  # type: ignore[attr-defined]
 
-def _delete_file_safely(file: Path) -> None:
+
+def _delete_file_safely(file: str) -> None:
     """ファイルを安全に削除する
 
     ファイルが存在しない場合は、何もしない。
     Args:
-        file (Path): 削除するファイルのパス
+        file (str): 削除するファイルのパス
+    """
+    if os.path.isfile(file):
+        os.unlink(file)
+
+
+def _scan_asset_names(asset_dir: str) -> dict[str, str]:
+    """アセットフォルダ内のファイル名を拡張子を除いた名前で引ける辞書を作成する
+
+    同じ名前のファイルが複数ある場合は最初に見つかったものを使う。フォルダが存在しない場合は空の辞書を返す。
+    Args:
+        asset_dir (str): アセットフォルダのパス
+
+    Returns:
+        dict[str, str]: 拡張子を除いた名前(os.path.normcase済み)からファイル名への辞書
+    """
+    asset_names: dict[str, str] = {}
+    try:
+        with os.scandir(asset_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    stem = entry.name.rpartition(".")[0]
+                    if stem:
+                        asset_names.setdefault(os.path.normcase(stem), entry.name)
+    except FileNotFoundError:
+        pass
+    return asset_names
+
+
+def _prune(dir_path: Path, targeted_names: set[str], extension: str | None = None) -> None:
+    """フォルダ内のファイルのうち、拡張子を除いた名前がターゲットに含まれないものを削除する
+
+    Args:
+        dir_path (Path): 対象のフォルダのパス
+        targeted_names (set[str]): 削除せずに残すファイルの拡張子を除いた名前
+        extension (str | None, optional): 指定した場合、この拡張子のファイルのみを対象とする。 Defaults to None.
     """
-    if file.exists() and file.is_file():
-        file.unlink()
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            if extension is not None and ext != extension:
+                continue
+            if stem not in targeted_names and entry.is_file():
+                os.unlink(entry.path)
 
 
 @dataclass
@@ -69,6 +128,16 @@ def create_hardlink(  # noqa: C901
     hardlink_clip_dir = hardlink_dir / AUDIO_CLIP_FOLDER_NAME
     hardlink_album_art_dir.mkdir(parents=True, exist_ok=True)
     hardlink_clip_dir.mkdir(parents=True, exist_ok=True)
+    # ループ内でresolveしないよう、絶対パスを事前に解決しておく
+    source_custom_chart_root = str(source_custom_chart_dir.resolve())
+    hardlink_root = str(hardlink_dir.resolve())
+    source_album_art_root = str(source_album_art_dir.resolve())
+    source_clip_root = str(source_clip_dir.resolve())
+    hardlink_album_art_root = str(hardlink_album_art_dir.resolve())
+    hardlink_clip_root = str(hardlink_clip_dir.resolve())
+    # アセットはファイルごとに探さず、フォルダを一度だけ走査して引けるようにしておく
+    album_art_names = _scan_asset_names(source_album_art_root)
+    clip_names = _scan_asset_names(source_clip_root)
 
     # すでにハードリンクとして存在する不要なファイルを削除
     if not keep_previous_hardlinks:
@@ -79,55 +148,44 @@ def create_hardlink(  # noqa: C901
             on_each_creation(idx, len(srtb_list))
         srtb_stem, albumart_asset_name, clip_asset_name = srtb
         # srtbファイルのハードリンク作成
-        src_srtb = source_custom_chart_dir / f"{srtb_stem}.srtb"
-        dst_srtb = hardlink_dir / f"{srtb_stem}.srtb"
+        srtb_name = f"{srtb_stem}.srtb"
         try:
-            win32file.CreateHardLink(str(dst_srtb.resolve()), str(src_srtb.resolve()))
-        except pywintypes.error as e:
-            if e.winerror == 2:
-                # ソースファイルが存在しない
-                logger.warning(f"ソースファイルが存在しないためスキップされました: {src_srtb.name}")
-                continue
-            elif e.winerror == 183:
-                # すでにハードリンクが存在する
-                logger.debug(f"既にソースファイルが存在するためスキップされました: {src_srtb.name}")
-                result.success_creation_count += 1
-                continue
-            elif e.winerror == 17:
+            _create_hardlink(os.path.join(hardlink_root, srtb_name), os.path.join(source_custom_chart_root, srtb_name))
+        except FileNotFoundError:
+            # ソースファイルが存在しない
+            logger.warning("ソースファイルが存在しないためスキップされました: %s", srtb_name)
+            continue
+        except FileExistsError:
+            # すでにハードリンクが存在する
+            logger.debug("既にソースファイルが存在するためスキップされました: %s", srtb_name)
+            result.success_creation_count += 1
+            continue
+        except OSError as e:
+            if e.errno == errno.EXDEV:
                 # 同じボリューム内でのみハードリンクが作成可能
                 result.has_error = True
                 result.error_message = "同じボリューム内でのみハードリンクが作成可能です。設定を見直してください"
                 break
             else:
                 # 再スロー
-                logger.exception(f"ハードリンク作成に失敗: {e}")
+                logger.exception("ハードリンク作成に失敗: %s", e)
                 raise e
         # アルバムアートのハードリンク作成
-        album_art_files = source_album_art_dir.glob(glob.escape(albumart_asset_name) + ".*")
-        src_album_art_file = None
-        for file in album_art_files:
-            if file.is_file():
-                src_album_art_file = file
-                break
-        if src_album_art_file is not None:
-            dst_art = hardlink_album_art_dir / src_album_art_file.name
+        album_art_name = album_art_names.get(os.path.normcase(albumart_asset_name))
+        if album_art_name is not None:
+            dst_art = os.path.join(hardlink_album_art_root, album_art_name)
             _delete_file_safely(dst_art)
-            win32file.CreateHardLink(str(dst_art.resolve()), str(src_album_art_file.resolve()))
+            _create_hardlink(dst_art, os.path.join(source_album_art_root, album_art_name))
         else:
-            logger.warning(f"画像ファイル「{albumart_asset_name}」が見つかりません")
+            logger.warning("画像ファイル「%s」が見つかりません", albumart_asset_name)
         # クリップのハードリンク作成
-        clip_files = source_clip_dir.glob(glob.escape(clip_asset_name) + ".*")
-        src_clip_file = None
-        for file in clip_files:
-            if file.is_file():
-                src_clip_file = file
-                break
-        if src_clip_file is not None:
-            dst_clip = hardlink_clip_dir / src_clip_file.name
+        clip_name = clip_names.get(os.path.normcase(clip_asset_name))
+        if clip_name is not None:
+            dst_clip = os.path.join(hardlink_clip_root, clip_name)
             _delete_file_safely(dst_clip)
-            win32file.CreateHardLink(str(dst_clip.resolve()), str(src_clip_file.resolve()))
+            _create_hardlink(dst_clip, os.path.join(source_clip_root, clip_name))
         else:
-            logger.warning(f"音声ファイル「{clip_asset_name}」が見つかりません")
+            logger.warning("音声ファイル「%s」が見つかりません", clip_asset_name)
         # 成功カウント
         result.success_creation_count += 1
     return result
@@ -141,24 +199,11 @@ def delete_untargeted_hardlinks(srtb_list: list[tuple[str, str, str]], hardlink_
         hardlink_dir (Path): ハードリンクフォルダのパス
     """
     # srtbファイルの削除
-    srtb_files = hardlink_dir.glob("*.srtb")
-
-    targeted_srtb_stem = [srtb[0] for srtb in srtb_list]
-    for file in srtb_files:
-        if file.is_file() and file.stem not in targeted_srtb_stem:
-            file.unlink()
+    _prune(hardlink_dir, {srtb[0] for srtb in srtb_list}, extension=".srtb")
     # アルバムアートの削除
-    album_art_files = (hardlink_dir / ALBUM_ART_FOLDER_NAME).glob("*")
-    targeted_album_art_name = [srtb[1] for srtb in srtb_list]
-    for file in album_art_files:
-        if file.is_file() and file.stem not in targeted_album_art_name:
-            file.unlink()
+    _prune(hardlink_dir / ALBUM_ART_FOLDER_NAME, {srtb[1] for srtb in srtb_list})
     # クリップの削除
-    clip_files = (hardlink_dir / AUDIO_CLIP_FOLDER_NAME).glob("*")
-    targeted_clip_name = [srtb[2] for srtb in srtb_list]
-    for file in clip_files:
-        if file.is_file() and file.stem not in targeted_clip_name:
-            file.unlink()
+    _prune(hardlink_dir / AUDIO_CLIP_FOLDER_NAME, {srtb[2] for srtb in srtb_list})
 
 
 def delete_all_hardlinks() -> None:
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging.config
-import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from logging import getLogger
 from typing import TYPE_CHECKING
 
@@ -17,16 +17,18 @@ if TYPE_CHECKING:
     pass
 
 logger = getLogger(__name__)
+# 設定タブのインデックス
+SETTING_TAB_INDEX = 1
 
 
-def set_page_stat_from_cache(page: ft.Page) -> None:
+def set_page_stat_from_cache(page: ft.Page, user_envs: dict) -> None:
     """キャッシュからウィンドウ情報を復元
 
     Args:
         page (ft.Page): ページオブジェクト
+        user_envs (dict): 読み込み済みのキャッシュ
     """
     logger.info("キャッシュからアプリ情報を復元")
-    user_envs = cache.load_cache()
     try:
         page.window.width = user_envs["window"]["width"]  # 幅
         page.window.height = user_envs["window"]["height"]  # 高さ
@@ -47,12 +49,13 @@ def main(page: ft.Page) -> None:
     Args:
         page (ft.Page): ページオブジェクト
     """
-    load_logger_settings()
+    # 起動時に並行して実行したロガーの設定とキャッシュの読み込みを待つ
+    _logger_future.result()
     # fletのログレベルを設定
     getLogger("flet_core").setLevel(logging.INFO)
     getLogger("flet_runtime").setLevel(logging.INFO)
     # キャッシュからウィンドウ情報を復元
-    set_page_stat_from_cache(page)
+    set_page_stat_from_cache(page, _cache_future.result())
     # ページの設定
     page.title = "Spinチャートローダー"
     page.theme = ft.Theme(
@@ -65,6 +68,8 @@ def main(page: ft.Page) -> None:
     page.padding = ft.padding.all(0)
     # ウィンドウクローズイベントをキャッチできるようにする
     page.window.prevent_close = True
+    # 終了時の保存処理を実行するスレッド
+    close_executor = ThreadPoolExecutor(max_workers=1)
 
     def on_close(e: ft.WindowEvent) -> None:
         """ウィンドウが閉じられた際の処理"""
@@ -84,15 +89,34 @@ def main(page: ft.Page) -> None:
             content=ft.ProgressBar(),
         )
         page.open(ending_modal)
-        time.sleep(0.5)
-        cache.save_cache(window_cache)
-        filter_tab.save_cache()
+        # page.openはダイアログを送信してから戻るため、待たずに保存を始める
+        # ウィンドウ情報とフィルタ条件をまとめて1回で書き込み、完了後にウィンドウを閉じる
+        future = close_executor.submit(cache.save_cache, window_cache | filter_tab.cache_values())
+        future.add_done_callback(lambda f: page.run_thread(on_finish_saving_cache, f))
+
+    def on_finish_saving_cache(future: Future[None]) -> None:
+        """終了時のキャッシュ保存が完了した際の処理"""
+        if future.exception() is not None:
+            logger.error("キャッシュの保存に失敗", exc_info=future.exception())
         page.window.destroy()
 
     # ウィンドウのイベントハンドラを設定
     page.window.on_event = on_close
 
     filter_tab = FilterTab()
+    # 設定タブは初めて選択されたときに作成する(起動時のDB・設定ファイルの読み込みを省くため)
+    setting_tab = ft.Tab(
+        text="設定",
+        icon=ft.icons.SETTINGS,
+        content=ft.Container(),
+    )
+
+    def on_change_tab(e: ft.ControlEvent) -> None:
+        """タブが切り替えられた際の処理"""
+        if main_content.selected_index == SETTING_TAB_INDEX and not isinstance(setting_tab.content, SettingTab):
+            setting_tab.content = SettingTab()
+            main_content.update()
+
     main_content = ft.Tabs(
         selected_index=0,
         animation_duration=200,
@@ -101,12 +125,9 @@ def main(page: ft.Page) -> None:
                 text="フィルター",
                 content=filter_tab,
             ),
-            ft.Tab(
-                text="設定",
-                icon=ft.icons.SETTINGS,
-                content=SettingTab(),
-            ),
+            setting_tab,
         ],
+        on_change=on_change_tab,
         scrollable=True,
         expand=True,
     )
@@ -114,5 +135,9 @@ def main(page: ft.Page) -> None:
     page.add(main_content)
 
 
+# ウィンドウの起動と並行して、ロガーの設定とキャッシュの読み込みを行う
+_startup_executor = ThreadPoolExecutor(max_workers=2)
+_logger_future = _startup_executor.submit(load_logger_settings)
+_cache_future = _startup_executor.submit(cache.load_cache)
 # アプリ実行
 ft.app(main)
@@ -1,5 +1,6 @@
 """フィルタタブ画面を提供するモジュール"""
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from logging import getLogger
 
 import flet as ft
@@ -9,19 +10,24 @@ import chart_db
 import hardlink_proc
 from components.filter_options import ChartFileterGroup, DropdownFilterOptionForm, TextFilterOptionForm
 
+from .progress_throttle import ProgressThrottle
+
 logger = getLogger(__name__)
+# 再生時間フィルタの選択肢(キー, 表示テキスト)。0秒から7分まで30秒刻み
+_DURATION_OPTIONS = tuple((f"{i}", f"{i // 60}分{i % 60}秒") for i in range(0, 60 * 7 + 1, 30))
 
 
-def search_charts_from_filter_values(filter_values: dict) -> list[tuple[str, str, str]]:
+def search_charts_from_filter_values(positive_values: dict, negative_values: dict) -> list[tuple[str, str, str]]:
     """フィルタ条件に一致するチャートファイル情報のリストを取得する
 
     Args:
-        filter_values (dict): フィルタ条件
+        positive_values (dict): 一致させるフィルタ条件
+        negative_values (dict): 除外するフィルタ条件
 
     Returns:
         list[tuple[str, str, str]]: フィルタ条件に一致するチャートファイル情報のリスト
     """
-    search_condition = chart_db.SearchCondition(**filter_values)
+    search_condition = chart_db.SearchCondition(**positive_values, **negative_values)
     return chart_db.search_file_reference(search_condition)
 
 
@@ -34,6 +40,8 @@ class FilterTab(ft.Container):
     def __init__(self) -> None:
         """フィルタタブ画面を作成する"""
         super().__init__()
+        # 時間のかかる処理を実行するスレッド
+        self._executor = ThreadPoolExecutor(max_workers=1)
         self.init_chart_filter_groups()
         self.hardlink_creation_button = ft.ElevatedButton(
             "ハードリンク切替",
@@ -46,6 +54,7 @@ class FilterTab(ft.Container):
             icon=ft.icons.ADD,
         )
         self.hardlink_progress_bar = ft.ProgressBar()
+        self._progress_throttle = ProgressThrottle()
         self.hardlink_progress_text = ft.Text(size=12)
         self.hardlink_progress_info = ft.Column(
             controls=[
@@ -95,33 +104,7 @@ class FilterTab(ft.Container):
         Args:
             e (ft.ControlEvent): イベント情報
         """
-        self.hardlink_progress_info.visible = True
-        self.hardlink_creation_button.disabled = True
-        self.hardlink_add_button.disabled = True
-        self.page.update()
-        search_result = search_charts_from_filter_values(self.positive_fliter.values() | self.negative_filter.values())
-        logger.info("ハードリンク作成開始: %d 件", len(search_result))
-        result = hardlink_proc.create_hardlink(search_result, on_each_creation=self.on_each_hardlink_creation)
-        logger.info("ハードリンク作成結果: %s", result)
-
-        self.hardlink_progress_info.visible = False
-        self.hardlink_creation_button.disabled = False
-        self.hardlink_add_button.disabled = False
-        if result.has_error:
-            snackbar = ft.SnackBar(
-                content=ft.Text(f"{result.error_message}"),
-                duration=3000,
-            )
-        else:
-            snackbar = ft.SnackBar(
-                content=ft.Text(
-                    f"{result.success_creation_count}/{len(search_result)} 件のハードリンクが作成されました"
-                ),
-                duration=3000,
-            )
-        self.page.overlay.append(snackbar)
-        snackbar.open = True
-        self.page.update()
+        self.start_hardlink_creation(keep_previous_hardlinks=False)
 
     def on_add_hardlink_add_button(self, e: ft.ControlEvent) -> None:
         """ハードリンク追加ボタンがクリックされたときのコールバック関数
@@ -129,32 +112,81 @@ class FilterTab(ft.Container):
         Args:
             e (ft.ControlEvent): イベント情報
         """
+        self.start_hardlink_creation(keep_previous_hardlinks=True)
+
+    def start_hardlink_creation(self, keep_previous_hardlinks: bool) -> None:
+        """ハードリンク作成をバックグラウンドで開始する
+
+        Args:
+            keep_previous_hardlinks (bool): すでに存在するハードリンクを削除せずに追加するかどうか
+        """
         self.hardlink_progress_info.visible = True
         self.hardlink_creation_button.disabled = True
         self.hardlink_add_button.disabled = True
         self.page.update()
-        search_result = search_charts_from_filter_values(self.positive_fliter.values() | self.negative_filter.values())
-        logger.info("ハードリンク追加開始: %d 件", len(search_result))
+        self._progress_throttle.reset()
+        future = self._executor.submit(
+            self.create_hardlink, self.positive_fliter.values(), self.negative_filter.values(), keep_previous_hardlinks
+        )
+        future.add_done_callback(
+            lambda f: self.page.run_thread(self.on_finish_hardlink_creation, f, keep_previous_hardlinks)
+        )
+
+    def create_hardlink(
+        self, positive_values: dict, negative_values: dict, keep_previous_hardlinks: bool
+    ) -> tuple[int, hardlink_proc.Result]:
+        """フィルタ条件に一致するチャートのハードリンクを作成する
+
+        バックグラウンドのスレッドで実行される
+
+        Args:
+            positive_values (dict): 一致させるフィルタ条件
+            negative_values (dict): 除外するフィルタ条件
+            keep_previous_hardlinks (bool): すでに存在するハードリンクを削除せずに追加するかどうか
+
+        Returns:
+            tuple[int, hardlink_proc.Result]: 対象のチャート数と、ハードリンク作成の結果
+        """
+        action = "追加" if keep_previous_hardlinks else "作成"
+        search_result = search_charts_from_filter_values(positive_values, negative_values)
+        logger.info("ハードリンク%s開始: %d 件", action, len(search_result))
         result = hardlink_proc.create_hardlink(
-            search_result, on_each_creation=self.on_each_hardlink_creation, keep_previous_hardlinks=True
+            search_result,
+            on_each_creation=self.on_each_hardlink_creation,
+            keep_previous_hardlinks=keep_previous_hardlinks,
         )
-        logger.info("ハードリンク追加結果: %s", result)
+        logger.info("ハードリンク%s結果: %s", action, result)
+        return len(search_result), result
+
+    def on_finish_hardlink_creation(
+        self, future: Future[tuple[int, hardlink_proc.Result]], keep_previous_hardlinks: bool
+    ) -> None:
+        """ハードリンク作成が完了したときのコールバック関数
 
+        Args:
+            future (Future[tuple[int, hardlink_proc.Result]]): ハードリンク作成処理のFuture
+            keep_previous_hardlinks (bool): すでに存在するハードリンクを削除せずに追加したかどうか
+        """
         self.hardlink_progress_info.visible = False
         self.hardlink_creation_button.disabled = False
         self.hardlink_add_button.disabled = False
-        if result.has_error:
-            snackbar = ft.SnackBar(
-                content=ft.Text(f"{result.error_message}"),
-                duration=3000,
-            )
+        try:
+            total, result = future.result()
+        except Exception:
+            logger.exception("ハードリンク作成に失敗")
+            snackbar = ft.SnackBar(content=ft.Text("ハードリンクの作成に失敗しました"), duration=3000)
         else:
-            snackbar = ft.SnackBar(
-                content=ft.Text(
-                    f"{result.success_creation_count}/{len(search_result)} 件のハードリンクが追加されました"
-                ),
-                duration=3000,
-            )
+            if result.has_error:
+                snackbar = ft.SnackBar(
+                    content=ft.Text(f"{result.error_message}"),
+                    duration=3000,
+                )
+            else:
+                action = "追加" if keep_previous_hardlinks else "作成"
+                snackbar = ft.SnackBar(
+                    content=ft.Text(f"{result.success_creation_count}/{total} 件のハードリンクが{action}されました"),
+                    duration=3000,
+                )
         self.page.overlay.append(snackbar)
         snackbar.open = True
         self.page.update()
@@ -166,8 +198,12 @@ class FilterTab(ft.Container):
             idx (int): 呼び出し回数
             total (int): ハードリンク作成するファイル総数
         """
+        if not self._progress_throttle.should_update(idx, total):
+            return
         self.hardlink_progress_bar.value = float(idx) / total
         self.hardlink_progress_text.value = f"({idx}/{total}) ハードリンクを作成中..."
+        if not self._progress_throttle.should_send(self, idx, total):
+            return
         self.page.update()
 
     def on_click_check_count_button(self, e: ft.ControlEvent) -> None:
@@ -177,7 +213,7 @@ class FilterTab(ft.Container):
             e (ft.ControlEvent): イベント情報
         """
         logger.info("該当件数カウント開始")
-        search_result = search_charts_from_filter_values(self.positive_fliter.values() | self.negative_filter.values())
+        search_result = search_charts_from_filter_values(self.positive_fliter.values(), self.negative_filter.values())
         logger.info("該当件数カウント完了: %d 件", len(search_result))
         snackbar = ft.SnackBar(content=ft.Text(f"{len(search_result)}件が該当します"), duration=3000)
         self.page.open(snackbar)
@@ -206,16 +242,12 @@ class FilterTab(ft.Container):
                 DropdownFilterOptionForm(
                     "min_duration",
                     label="最短再生時間",
-                    options=[
-                        ft.dropdown.Option(key=f"{i}", text=f"{i//60}分{i%60}秒") for i in range(0, 60 * 7 + 1, 30)
-                    ],
+                    options=[ft.dropdown.Option(key=key, text=text) for key, text in _DURATION_OPTIONS],
                 ),
                 DropdownFilterOptionForm(
                     "max_duration",
                     label="最長再生時間",
-                    options=[
-                        ft.dropdown.Option(key=f"{i}", text=f"{i//60}分{i%60}秒") for i in range(0, 60 * 7 + 1, 30)
-                    ],
+                    options=[ft.dropdown.Option(key=key, text=text) for key, text in _DURATION_OPTIONS],
                 ),
             ],
         )
@@ -238,12 +270,16 @@ class FilterTab(ft.Container):
         厳密にはpageのコントロールから削除された場合に呼び出されるが、アプリ終了時にpage側でこの処理を強制している
         """
         super().will_unmount()
-        cache.save_cache(
-            {"positive_filter": self.positive_fliter.values(), "negative_filter": self.negative_filter.values()}
-        )
+        self.save_cache()
+
+    def cache_values(self) -> dict:
+        """キャッシュに保存するフィルタ条件を取得
+
+        Returns:
+            dict: キャッシュに保存する内容
+        """
+        return {"positive_filter": self.positive_fliter.values(), "negative_filter": self.negative_filter.values()}
 
     def save_cache(self) -> None:
         """フィルタ条件をキャッシュに保存"""
-        cache.save_cache(
-            {"positive_filter": self.positive_fliter.values(), "negative_filter": self.negative_filter.values()}
-        )
+        cache.save_cache(self.cache_values())
@@ -0,0 +1,63 @@
+"""進捗表示の更新頻度を抑えるモジュール"""
+
+import time
+
+import flet as ft
+
+from .tab_visibility import is_in_selected_tab
+
+# 進捗表示を更新する最短間隔(秒)。30FPS相当
+PROGRESS_UPDATE_INTERVAL = 1 / 30
+
+
+class ProgressThrottle:
+    """進捗表示の更新を間引くクラス
+
+    画面更新の通信量を抑えるため、最後の1件以外は進捗率(%)が変わったときに一定間隔でのみ更新する
+    """
+
+    def __init__(self) -> None:
+        """進捗表示の更新を間引くクラスを作成する"""
+        self._last_update_ts = 0.0
+        self._last_pct = -1
+
+    def reset(self) -> None:
+        """新しい処理の開始時に状態を初期化する"""
+        self._last_update_ts = 0.0
+        self._last_pct = -1
+
+    def should_update(self, idx: int, total: int) -> bool:
+        """進捗表示を更新するかを返す
+
+        Args:
+            idx (int): 処理済みの件数
+            total (int): 処理する総数
+
+        Returns:
+            bool: 進捗表示を更新するかどうか
+        """
+        if idx + 1 >= total:
+            return True
+        pct = idx * 100 // total
+        now = time.monotonic()
+        if pct == self._last_pct or now - self._last_update_ts < PROGRESS_UPDATE_INTERVAL:
+            return False
+        self._last_pct = pct
+        self._last_update_ts = now
+        return True
+
+    def should_send(self, control: ft.Control, idx: int, total: int) -> bool:
+        """更新した進捗表示を画面に送信するかを返す
+
+        選択されていないタブには送信しない。コントロールの値は呼び出し側で更新しておき、
+        タブが選択された後の更新か最後の1件でまとめて反映する
+
+        Args:
+            control (ft.Control): 進捗を表示するコントロール
+            idx (int): 処理済みの件数
+            total (int): 処理する総数
+
+        Returns:
+            bool: 画面に送信するかどうか
+        """
+        return idx + 1 >= total or is_in_selected_tab(control)
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from logging import getLogger
 from typing import TYPE_CHECKING
 
@@ -10,6 +11,8 @@ import flet as ft
 import chart_db
 import settings
 
+from .progress_throttle import ProgressThrottle
+
 if TYPE_CHECKING:
     import srtb
 logger = getLogger(__name__)
@@ -39,8 +42,11 @@ class DatabasePane(ft.Column):
     def __init__(self) -> None:
         """データベースに関する設定画面を作成する"""
         super().__init__()
+        # チャートデータのロードとデータベースの初期化を実行するスレッド
+        self._executor = ThreadPoolExecutor(max_workers=1)
         self.latest_load_date = ft.TextSpan(chart_db.get_latest_update_date())
         self.progress_bar = ft.ProgressBar()
+        self._progress_throttle = ProgressThrottle()
         self.progress_text = ft.Text(size=12)
         self.progress_info = ft.Column(
             controls=[
@@ -80,25 +86,44 @@ class DatabasePane(ft.Column):
         ]
 
     def on_load_chart_data(self, e: ft.ControlEvent) -> None:
-        """チャートデータをロードする
+        """チャートデータのロードをバックグラウンドで開始する
 
         Args:
             e (ft.ControlEvent): イベント情報
         """
         logger.info("チャートデータのロードを開始")
-        # ロード状況を表示 / ロードボタンを無効化
+        # ロード状況を表示 / ロード中はデータベースの初期化と競合するため両方のボタンを無効化
         self.progress_info.visible = True
         self.load_button.disabled = True
+        self.truncate_button.disabled = True
         self.update()
+        self._progress_throttle.reset()
         user_settings = settings.load_settings()
-        chart_db.load_srtb_files_to_sqlite(user_settings.custom_charts_dir, on_each_load=self.on_each_chart_load)
-        logger.info("チャートデータのロードが完了")
+        future = self._executor.submit(
+            chart_db.load_srtb_files_to_sqlite, user_settings.custom_charts_dir, on_each_load=self.on_each_chart_load
+        )
+        future.add_done_callback(lambda f: self.page.run_thread(self.on_finish_chart_load, f))
+
+    def on_finish_chart_load(self, future: Future[None]) -> None:
+        """チャートデータのロードが完了したときのコールバック関数
+
+        Args:
+            future (Future[None]): ロード処理のFuture
+        """
+        try:
+            future.result()
+        except Exception:
+            logger.exception("チャートデータのロードに失敗")
+            snackbar = ft.SnackBar(content=ft.Text("チャートデータのロードに失敗しました"), duration=3000)
+        else:
+            logger.info("チャートデータのロードが完了")
+            snackbar = ft.SnackBar(content=ft.Text("チャートデータをロードしました"), duration=3000)
         self.latest_load_date.text = chart_db.get_latest_update_date()
-        snackbar = ft.SnackBar(content=ft.Text("チャートデータをロードしました"), duration=3000)
         self.page.open(snackbar)
-        # ロード状況を非表示 / ロードボタンを有効化
+        # ロード状況を非表示 / ボタンを有効化
         self.progress_info.visible = False
         self.load_button.disabled = False
+        self.truncate_button.disabled = False
         self.page.update()
 
     def on_each_chart_load(self, srtb: srtb.Srtb, idx: int, total: int) -> None:
@@ -109,8 +134,12 @@ class DatabasePane(ft.Column):
             idx (int): コールバックの呼び出し回数
             total (int): ロードするファイル数
         """
+        if not self._progress_throttle.should_update(idx, total):
+            return
         self.progress_bar.value = idx / total
         self.progress_text.value = f"({idx}/{total}) ファイル{srtb.file_reference}をロード中"
+        if not self._progress_throttle.should_send(self, idx, total):
+            return
         self.update()
 
     def on_click_truncate_button(self, e: ft.ControlEvent) -> None:
@@ -119,11 +148,13 @@ class DatabasePane(ft.Column):
         Args:
             e (ft.ControlEvent): イベント情報
         """
+        self.load_button.disabled = True
         self.truncate_button.disabled = True
-        self.update()
         self.page.update()
-        chart_db.truncate_srtb_table()
+        # ロードと同じスレッドで実行し、ロード中のトランザクションと混ざらないようにする
+        self._executor.submit(chart_db.truncate_srtb_table).result()
         logger.info("データベースの初期化を完了")
+        self.load_button.disabled = False
         self.truncate_button.disabled = False
         snackbar = ft.SnackBar(content=ft.Text("データベースを初期化しました"), duration=3000)
         self.page.open(snackbar)
@@ -177,9 +208,11 @@ class PathPane(ft.Column):
         new_settings = settings.Settings(
             custom_charts_dir=self.custom_chart_dir_text_field.value, hardlink_dir=self.hardlink_dir_text_field.value
         )
-        settings.save_settings(new_settings)
-        logger.info("パス設定を保存")
-        self.reload_settings_text_field()
+        # 変更がない場合は書き込みを省略する
+        if new_settings != settings.load_settings():
+            settings.save_settings(new_settings)
+            logger.info("パス設定を保存")
+            self.reload_settings_text_field()
         snackbar = ft.SnackBar(content=ft.Text("設定を保存しました"), duration=3000)
         self.page.open(snackbar)
         self.page.update()
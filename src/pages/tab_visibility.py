@@ -0,0 +1,23 @@
+"""タブ画面の表示状態を判定するモジュール"""
+
+import flet as ft
+
+
+def is_in_selected_tab(control: ft.Control) -> bool:
+    """コントロールが選択中のタブ内にあるかを返す
+
+    タブに含まれていないコントロールは常に表示されているものとして扱う
+
+    Args:
+        control (ft.Control): 判定するコントロール
+
+    Returns:
+        bool: 選択中のタブ内にあるかどうか
+    """
+    parent = control.parent
+    while parent is not None:
+        if isinstance(parent, ft.Tab) and isinstance(parent.parent, ft.Tabs):
+            tabs = parent.parent
+            return tabs.tabs.index(parent) == tabs.selected_index
+        parent = parent.parent
+    return True
@@ -1,6 +1,7 @@
 """設定ファイルのREAD/WRITEを提供するモジュール"""
 
 import os
+import tomllib
 from dataclasses import asdict, dataclass
 from pathlib import Path
 
@@ -10,7 +11,7 @@ import toml
 SETTINGS_PATH = "settings.toml"
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, frozen=True, slots=True)
 class Settings:
     """設定ファイルの内容を保持するデータクラス
 
@@ -23,25 +24,42 @@ class Settings:
     hardlink_dir: str
 
 
+# 読み込み済みの設定と、読み込み時点での設定ファイルの更新日時
+_cached: Settings | None = None
+_cached_mtime = 0.0
+
+
 def load_settings() -> Settings:
-    """設定ファイルを読み込む関数"""
-    if not os.path.exists(SETTINGS_PATH):
+    """設定ファイルを読み込む関数
+
+    ファイルの更新日時が前回の読み込みから変わっていなければ、読み込み済みの内容を返す
+    """
+    global _cached, _cached_mtime
+    try:
+        mtime = os.stat(SETTINGS_PATH).st_mtime
+    except FileNotFoundError:
         save_default_settings()
-    if os.path.exists(SETTINGS_PATH):
-        with open(SETTINGS_PATH, "r", encoding="utf-8") as f:
-            dict_settings = toml.load(f)
-        try:
-            return Settings(**dict_settings)
-        except TypeError as e:
-            raise ValueError("設定ファイルの形式が正しくありません") from e
-    else:
-        raise FileNotFoundError("設定ファイルが見つかりません")
+        mtime = os.stat(SETTINGS_PATH).st_mtime
+    if _cached is not None and mtime == _cached_mtime:
+        return _cached
+    # 読み込みは標準ライブラリのtomllibを使う(書き込みには対応していないためtomlを使う)
+    with open(SETTINGS_PATH, "rb") as f:
+        dict_settings = tomllib.load(f)
+    try:
+        _cached = Settings(**dict_settings)
+    except TypeError as e:
+        raise ValueError("設定ファイルの形式が正しくありません") from e
+    _cached_mtime = mtime
+    return _cached
 
 
 def save_settings(new_setting: Settings) -> None:
     """設定ファイルに書き込む関数"""
+    global _cached, _cached_mtime
     with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
         toml.dump(asdict(new_setting), f)
+    _cached = new_setting
+    _cached_mtime = os.stat(SETTINGS_PATH).st_mtime
 
 
 def save_default_settings() -> None:
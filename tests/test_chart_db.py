@@ -0,0 +1,119 @@
+"""chart_dbのスキーマ移行と検索条件のテスト"""
+
+import sqlite3
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from chart_db import SearchCondition, connection, search_file_reference
+
+# min_difficulty / max_difficulty 追加前のsrtbテーブル
+BASELINE_SCHEMA = """
+    CREATE TABLE srtb (
+        file_reference TEXT PRIMARY KEY,
+        track_title TEXT NOT NULL,
+        track_subtitle TEXT,
+        track_artist TEXT NOT NULL,
+        charter TEXT NOT NULL,
+        easy_difficulty INTEGER,
+        normal_difficulty INTEGER,
+        hard_difficulty INTEGER,
+        expert_difficulty INTEGER,
+        xd_difficulty INTEGER,
+        albumart_asset_name TEXT NOT NULL,
+        clip_asset_name TEXT NOT NULL,
+        self_path TEXT NOT NULL,
+        clip_duration INTEGER,
+        file_modified_at DATETIME,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+DIFFICULTY_COLUMNS = ("easy_difficulty", "normal_difficulty", "hard_difficulty", "expert_difficulty", "xd_difficulty")
+# (file_reference, track_title, track_artist, charter, easy, normal, hard, expert, xd)
+ROWS = [
+    ("a", "Night Drive", "Kagura", "alice", 3, 8, 14, 20, 27),
+    ("b", "夜明けのうた", "東京アーティスト", "ぼぶ", None, 5, None, 18, None),
+    ("c", "Nightmare Remix", "DJ Ab", "Charlie", None, None, None, None, None),
+    ("d", "あいうえお", "Kagura feat. 初音", "alice", 30, None, None, None, None),
+    ("e", "ab", "x", "東方", 1, 1, 1, 1, 1),
+    ("f", "NIGHT", "アーティスト", "Ab", None, None, 12, None, 33),
+]
+KEYWORDS = ["a", "Ab", "ab", "night", "NIGHT", "夜", "アー", "アーティスト", "初音", "東方", "zzz", "ght D"]
+
+
+@pytest.fixture
+def conn(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[sqlite3.Connection]:
+    monkeypatch.chdir(tmp_path)
+    baseline = sqlite3.connect("charts.db")
+    baseline.execute(BASELINE_SCHEMA)
+    baseline.executemany(
+        f"""
+        INSERT INTO srtb (
+            file_reference, track_title, track_artist, charter, {", ".join(DIFFICULTY_COLUMNS)},
+            albumart_asset_name, clip_asset_name, self_path, clip_duration, file_modified_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '', '', '', 120, 0)
+        """,  # noqa: S608
+        ROWS,
+    )
+    baseline.commit()
+    baseline.close()
+    monkeypatch.setattr(connection, "_conn", None)
+    conn = connection.get_db_connection()
+    yield conn
+    conn.close()
+
+
+def _file_references(condition: SearchCondition) -> set[str]:
+    return {row[0] for row in search_file_reference(condition)}
+
+
+def _plain_query(conn: sqlite3.Connection, where: str, params: list) -> set[str]:
+    return {row[0] for row in conn.execute(f"SELECT file_reference FROM srtb WHERE {where}", params)}  # noqa: S608
+
+
+def test_difficulty_range_columns_are_backfilled(conn: sqlite3.Connection) -> None:
+    stored = {
+        row[0]: (row[1], row[2])
+        for row in conn.execute("SELECT file_reference, min_difficulty, max_difficulty FROM srtb")
+    }
+    for file_reference, *_, easy, normal, hard, expert, xd in ROWS:
+        levels = [level for level in (easy, normal, hard, expert, xd) if level is not None]
+        expected = (min(levels), max(levels)) if levels else (None, None)
+        assert stored[file_reference] == expected
+
+
+@pytest.mark.parametrize("level", range(1, 35))
+def test_difficulty_filters_match_or_conditions(conn: sqlite3.Connection, level: int) -> None:
+    min_where = " OR ".join(f"{column} >= ?" for column in DIFFICULTY_COLUMNS)
+    max_where = " OR ".join(f"{column} <= ?" for column in DIFFICULTY_COLUMNS)
+    assert _file_references(SearchCondition(min_diff_level=str(level))) == _plain_query(
+        conn, min_where, [level] * len(DIFFICULTY_COLUMNS)
+    )
+    assert _file_references(SearchCondition(max_diff_level=str(level))) == _plain_query(
+        conn, max_where, [level] * len(DIFFICULTY_COLUMNS)
+    )
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+@pytest.mark.parametrize(
+    ("field", "column"), [("title", "track_title"), ("artist", "track_artist"), ("charter", "charter")]
+)
+def test_keyword_filters_match_plain_like(conn: sqlite3.Connection, keyword: str, field: str, column: str) -> None:
+    assert _file_references(SearchCondition(**{field: [keyword]})) == _plain_query(
+        conn, f"{column} LIKE ?", [f"%{keyword}%"]
+    )
+    assert _file_references(SearchCondition(**{field: [keyword, "夜明け"]})) == _plain_query(
+        conn, f"({column} LIKE ? OR {column} LIKE ?)", [f"%{keyword}%", "%夜明け%"]
+    )
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+@pytest.mark.parametrize(("field", "column"), [("exclude_artist", "track_artist"), ("exclude_charter", "charter")])
+def test_exclude_filters_match_plain_not_like(conn: sqlite3.Connection, keyword: str, field: str, column: str) -> None:
+    assert _file_references(SearchCondition(**{field: [keyword]})) == _plain_query(
+        conn, f"{column} NOT LIKE ?", [f"%{keyword}%"]
+    )
+    assert _file_references(SearchCondition(**{field: [keyword, "alice"]})) == _plain_query(
+        conn, f"({column} NOT LIKE ? AND {column} NOT LIKE ?)", [f"%{keyword}%", "%alice%"]
+    )